@@ -2,6 +2,8 @@ import streamlit as st
 import os
 import tempfile
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_community.cache import SQLiteCache
 from graph_builder import GraphBuilder
 from rag_chain import GraphRAGChain
 from web_loader import WebLoader
@@ -10,6 +12,13 @@ from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
+# Cache LLM responses (temperature=0, so identical prompts give identical output).
+# Keyed on the full prompt + model params: editing a prompt template simply misses
+# the cache. Delete .langchain_cache.db to clear it. Set once per process, not on
+# every Streamlit rerun; shared by the graph builder and the RAG chain.
+if get_llm_cache() is None:
+    set_llm_cache(SQLiteCache(database_path=".langchain_cache.db"))
+
 st.set_page_config(page_title="GraphRAG Web Scraper", layout="wide")
 
 st.title("🕸️ GraphRAG Web: Chat with the Internet")
@@ -58,6 +67,7 @@ with st.sidebar:
                     # 3. Ingest into Graph
                     st.text(f"Building Knowledge Graph from {len(splits)} chunks...")
                     st.session_state.graph_builder.ingest_documents(splits)
+                    st.session_state.rag_chain.refresh_entity_ids()
                     
                     # 4. Add to Vector Store
                     st.text("Updating Vector Index...")
@@ -82,8 +92,8 @@ with tab1:
             with st.spinner("Thinking (Traversing Graph + Searching Vectors)..."):
                 try:
                     chain = st.session_state.rag_chain.get_chain()
-                    response = chain.invoke(prompt)
-                    st.markdown(response)
+                    # Stream tokens as they arrive instead of waiting for the full answer
+                    response = st.write_stream(chain.stream(prompt))
                     st.session_state.messages.append({"role": "assistant", "content": response})
                 except Exception as e:
                     st.error(f"An error occurred: {e}")
@@ -1,9 +1,12 @@
 import os
-from typing import List, Optional
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from langchain_core.documents import Document
 from langchain_groq import ChatGroq
 from langchain_community.graphs import Neo4jGraph
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.rate_limiters import InMemoryRateLimiter
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
@@ -26,11 +29,24 @@ class GraphData(BaseModel):
 
 # --- Graph Builder Logic ---
 class GraphBuilder:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 16):
+        self.max_concurrency = max_concurrency
+        # Single writer thread: batches are committed in order (nodes before the
+        # relationships that MATCH them) without concurrent MERGEs contending for locks
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        # Optional token bucket: set GROQ_RPM (requests/minute, e.g. 30 on Groq's
+        # free tier) to keep parallel extraction under the account's rate limit.
+        # Unset means no client-side throttling, only max_concurrency applies.
+        groq_rpm = os.getenv("GROQ_RPM")
+        self.rate_limiter = InMemoryRateLimiter(
+            requests_per_second=int(groq_rpm) / 60,
+            max_bucket_size=max_concurrency
+        ) if groq_rpm else None
         self.llm = ChatGroq(
             model="llama-3.1-8b-instant",
             temperature=0,
-            groq_api_key=os.getenv("GROQ_API_KEY")
+            groq_api_key=os.getenv("GROQ_API_KEY"),
+            rate_limiter=self.rate_limiter
         )
         # Try-Except block to handle different LangChain versions for Neo4j
         try:
@@ -47,76 +63,108 @@ class GraphBuilder:
                 password=os.getenv("NEO4J_PASSWORD")
             )
 
-    def extract_graph_data(self, text: str) -> GraphData:
+        # Indexes so MERGE / MATCH on Entity.id don't do full label scans,
+        # plus a full-text index for the chat-time entity lookup
+        self.graph.query("CREATE INDEX entity_id IF NOT EXISTS FOR (n:Entity) ON (n.id)")
+        self.graph.query("CREATE FULLTEXT INDEX entity_fts IF NOT EXISTS FOR (n:Entity) ON EACH [n.id]")
+
+        # Build extraction chain once, reused by single and batched calls
         prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a knowledge graph extractor. Extract entities (nodes) and relationships from the text.
-            
-            CRITICAL GUIDELINES:
-            1. NODES: Identify key entities (Person, Organization, Product, Concept).
-            2. RELATIONSHIPS: MUST have a 'source', 'target', and 'type'.
-               - ❌ BAD:  {{ "source": "Apple", "type": "GROWS_ON" }}
-               - ✅ GOOD: {{ "source": "Apple", "target": "Tree", "type": "GROWS_ON" }}
-            3. ATTRIBUTES: If it's a property like Price or Color, link it to the Product.
-               - ✅ GOOD: {{ "source": "Shirt", "target": "Blue", "type": "HAS_COLOR" }}
-            4. IDS: Use the exact literal string for IDs to ensure merging.
-            
-            Return JSON matching the schema exactly."""),
+            ("system", "Extract entities (Person/Organization/Product/Concept) and relationships from the text. "
+                       "Every relationship must have source, target and type; link attributes like price or color "
+                       "to their product. Use exact literal names as IDs. Return JSON per schema."),
             ("human", "Text: {text}")
         ])
         
         # Use structured output with the fixed model
-        chain = prompt | self.llm.with_structured_output(GraphData)
-        return chain.invoke({"text": text})
+        self.extraction_chain = prompt | self.llm.with_structured_output(GraphData)
 
-    def ingest_documents(self, documents: List[Document]):
+    def extract_graph_data(self, text: str) -> GraphData:
+        return self.extraction_chain.invoke({"text": text})
+
+    def _flush(self, nodes_buffer: List[dict], rels_buffer: Dict[str, List[dict]]):
+        # Nodes pehle likhne zaroori hain, warna relationships ka MATCH fail hoga
+        if nodes_buffer:
+            try:
+                self.graph.query(
+                    "UNWIND $rows AS r MERGE (n:Entity {id: r.id}) SET n.type = r.type",
+                    {"rows": nodes_buffer}
+                )
+            except Exception as e:
+                print(f"⚠ Error writing {len(nodes_buffer)} nodes: {e}")
+
+        # Relationship type parameterize nahi ho sakta, is liye har type ki alag query
+        for rel_type, rows in rels_buffer.items():
+            cypher = f"""
+            UNWIND $rows AS r
+            MATCH (s:Entity {{id: r.source}})
+            MATCH (t:Entity {{id: r.target}})
+            MERGE (s)-[e:{rel_type}]->(t)
+            SET e.description = r.desc
+            """
+            try:
+                self.graph.query(cypher, {"rows": rows})
+            except Exception as e:
+                print(f"⚠ Error writing {len(rows)} '{rel_type}' relationships: {e}")
+
+    def ingest_documents(self, documents: List[Document], batch_size: int = 1000):
         print(f"Processing {len(documents)} documents...")
         
         # Optional: Clear database before starting (Uncomment if needed)
         # self.graph.query("MATCH (n) DETACH DELETE n")
         
-        for i, doc in enumerate(documents):
-            try:
-                print(f"Analyzing chunk {i+1}/{len(documents)}...")
-                data = self.extract_graph_data(doc.page_content)
-                
-                # Create Nodes
-                if data.nodes:
-                    for node in data.nodes:
-                        clean_id = node.id.strip() 
-                        self.graph.query(
-                            "MERGE (n:Entity {id: $id}) SET n.type = $type",
-                            {"id": clean_id, "type": node.type}
-                        )
-                
-                # Create Relationships
-                if data.relationships:
-                    for rel in data.relationships:
+        nodes_buffer: List[dict] = []
+        rels_buffer: Dict[str, List[dict]] = defaultdict(list)
+        pending = 0
+        writes = []
+
+        # Extract in slices so Neo4j writes of earlier slices (on the writer thread)
+        # overlap with LLM extraction of later ones
+        step = self.max_concurrency * 4
+        for offset in range(0, len(documents), step):
+            print(f"Analyzing chunks {offset+1}-{min(offset+step, len(documents))}/{len(documents)}...")
+            # Extract the slice concurrently; failures come back as exception objects
+            inputs = [{"text": doc.page_content} for doc in documents[offset:offset+step]]
+            results = self.extraction_chain.batch(
+                inputs,
+                config={"max_concurrency": self.max_concurrency},
+                return_exceptions=True
+            )
+
+            for i, data in enumerate(results, start=offset):
+                try:
+                    if isinstance(data, Exception):
+                        raise data
+                    
+                    # Collect Nodes
+                    for node in data.nodes or []:
+                        nodes_buffer.append({"id": node.id.strip(), "type": node.type})
+                        pending += 1
+                    
+                    # Collect Relationships
+                    for rel in data.relationships or []:
                         if not rel.target:
                             continue
-                            
-                        clean_source = rel.source.strip()
-                        clean_target = rel.target.strip()
-                        # Default description if None
-                        desc = rel.description if rel.description else ""
-                        
-                        cypher = f"""
-                        MATCH (s:Entity {{id: $source}})
-                        MATCH (t:Entity {{id: $target}})
-                        MERGE (s)-[r:{rel.type.upper().replace(' ', '_')}]->(t)
-                        SET r.description = $description
-                        """
-                        self.graph.query(
-                            cypher,
-                            {
-                                "source": clean_source, 
-                                "target": clean_target, 
-                                "description": desc
-                            }
-                        )
-                print(f"✔ Chunk {i+1} ingested successfully.")
-                
-            except Exception as e:
-                # Error print karega lekin process nahi rokega
-                print(f"⚠ Error processing chunk {i+1}: {e}")
 
-        print("Graph ingestion complete.")
\ No newline at end of file
+                        rels_buffer[rel.type.upper().replace(' ', '_')].append({
+                            "source": rel.source.strip(),
+                            "target": rel.target.strip(),
+                            # Default description if None
+                            "desc": rel.description if rel.description else ""
+                        })
+                        pending += 1
+                    
+                except Exception as e:
+                    # Error print karega lekin process nahi rokega
+                    print(f"⚠ Error processing chunk {i+1}: {e}")
+
+                # Write to Neo4j in batches instead of one query per node/edge
+                if pending >= batch_size:
+                    writes.append(self.writer.submit(self._flush, nodes_buffer, rels_buffer))
+                    nodes_buffer, rels_buffer, pending = [], defaultdict(list), 0
+
+        writes.append(self.writer.submit(self._flush, nodes_buffer, rels_buffer))
+        # Wait for the writer to drain before reporting completion
+        for future in writes:
+            future.result()
+        print("Graph ingestion complete.")
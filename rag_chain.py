@@ -1,4 +1,9 @@
+import asyncio
+import hashlib
 import os
+import re
+import torch
+from collections import defaultdict
 from typing import List
 from langchain_core.documents import Document
 from langchain_groq import ChatGroq
@@ -6,12 +11,23 @@ from langchain_community.graphs import Neo4jGraph
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
+# Characters with special meaning in Lucene query syntax (full-text index lookups)
+LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+def escape_lucene(text: str) -> str:
+    return LUCENE_SPECIAL.sub(r"\\\1", text)
+
+WORD_RE = re.compile(r"\w+")
+
+def normalize_entity(text: str) -> str:
+    return " ".join(WORD_RE.findall(text.lower()))
+
 class GraphRAGChain:
     def __init__(self):
         # 1. Initialize LLM
@@ -21,13 +37,27 @@ class GraphRAGChain:
             groq_api_key=os.getenv("GROQ_API_KEY")
         )
         
-        # 2. Initialize Embeddings
-        self.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        # 2. Initialize Embeddings (GPU if available, large encode batches)
+        self.embeddings = HuggingFaceEmbeddings(
+            model_name="all-MiniLM-L6-v2",
+            model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
+            encode_kwargs={"batch_size": 64, "normalize_embeddings": True}
+        )
         
         # 3. Initialize Vector Store (Chroma)
+        # HNSW params sized for a single-website corpus (<10K chunks); cosine
+        # matches the normalized embeddings. Params only apply when the
+        # collection is created, hence the dedicated collection name.
         self.vector_store = Chroma(
+            collection_name="graphrag_web",
             persist_directory="./chroma_db",
-            embedding_function=self.embeddings
+            embedding_function=self.embeddings,
+            collection_metadata={
+                "hnsw:space": "cosine",
+                "hnsw:construction_ef": 100,
+                "hnsw:M": 16,
+                "hnsw:search_ef": 32
+            }
         )
         
         # 4. Initialize Graph Store (Neo4j)
@@ -36,30 +66,107 @@ class GraphRAGChain:
             username=os.getenv("NEO4J_USERNAME"),
             password=os.getenv("NEO4J_PASSWORD")
         )
-
-    def add_documents_to_vector_store(self, documents: List[Document]):
-        self.vector_store.add_documents(documents)
         
-    def get_graph_context(self, query: str) -> str:
-        # Step A: Extract Entity
-        prompt = ChatPromptTemplate.from_template(
+        # 5. Cache known entity ids for local (no-LLM) entity matching
+        self.refresh_entity_ids()
+        
+        # 6. LLM fallback for entity extraction when no known id matches
+        entity_prompt = ChatPromptTemplate.from_template(
             """Extract the single most important entity (Product, Brand, or Category) from this query.
             Return ONLY the name.
             Query: {query}
             Entity:"""
         )
-        chain = prompt | self.llm | StrOutputParser()
-        entity = chain.invoke({"query": query}).strip()
-        print(f"🔍 Graph Looking for: {entity}")
+        self.entity_chain = entity_prompt | self.llm | StrOutputParser()
+
+    def refresh_entity_ids(self):
+        """Reload entity ids from Neo4j. Call after ingesting new documents."""
+        try:
+            rows = self.graph.query("MATCH (n:Entity) RETURN n.id AS id")
+        except Exception as e:
+            print(f"Graph Error: {e}")
+            rows = []
+        
+        # Normalized id -> original id
+        self.entity_ids = {normalize_entity(r['id']): r['id'] for r in rows if r['id']}
+        self.max_entity_words = max((len(k.split()) for k in self.entity_ids), default=0)
+
+    def match_entities(self, query: str) -> List[str]:
+        # Every run of query words that is exactly a known entity id, longest first.
+        # All of them go to the full-text query, whose BM25 score ranks the start
+        # nodes, instead of guessing here which match matters most.
+        words = WORD_RE.findall(query.lower())
+        matches = []
+        for n in range(min(self.max_entity_words, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                key = " ".join(words[i:i + n])
+                # Very short keys match too much noise ("a", "in", ...)
+                if len(key) >= 3 and key in self.entity_ids and self.entity_ids[key] not in matches:
+                    matches.append(self.entity_ids[key])
+        return matches
+
+    def add_documents_to_vector_store(self, documents: List[Document]):
+        # Deterministic ids (source URL + chunk index within that page) turn
+        # re-processing a site into upserts instead of duplicate vectors
+        ids = []
+        chunk_counts = defaultdict(int)
+        for doc in documents:
+            source = doc.metadata.get("source", "")
+            ids.append(hashlib.blake2b(f"{source}#{chunk_counts[source]}".encode(), digest_size=16).hexdigest())
+            chunk_counts[source] += 1
+            doc.metadata["content_hash"] = hashlib.blake2b(doc.page_content.encode(), digest_size=16).hexdigest()
+        
+        # Skip chunks whose stored content is unchanged, so they aren't re-embedded
+        existing = self.vector_store.get(ids=ids, include=["metadatas"])
+        stored_hashes = {
+            i: (m or {}).get("content_hash") for i, m in zip(existing["ids"], existing["metadatas"])
+        }
+        changed = [
+            (i, doc) for i, doc in zip(ids, documents)
+            if stored_hashes.get(i) != doc.metadata["content_hash"]
+        ]
+        print(f"Vector store: {len(changed)} new/changed chunks, {len(documents) - len(changed)} unchanged.")
+        
+        if changed:
+            self.vector_store.add_documents(
+                [doc for _, doc in changed], ids=[i for i, _ in changed]
+            )
+        
+    def get_graph_context(self, query: str) -> str:
+        # Step A: Extract Entities (local match first, LLM only as fallback)
+        entities = self.match_entities(query)
+        if not entities:
+            entities = [self.entity_chain.invoke({"query": query}).strip()]
+        return self.query_graph(entities)
+
+    async def aget_graph_context(self, query: str) -> str:
+        entities = self.match_entities(query)
+        if not entities:
+            entities = [(await self.entity_chain.ainvoke({"query": query})).strip()]
+        # Neo4jGraph is sync-only, so run the query off the event loop
+        return await asyncio.to_thread(self.query_graph, entities)
+
+    def query_graph(self, entities: List[str]) -> str:
+        print(f"🔍 Graph Looking for: {', '.join(entities)}")
 
         # Step B: Robust Graph Traversal (Fetch Properties too)
         # Hum node ki properties (price, description) bhi return karwayenge
+        # Start nodes come from the full-text (Lucene) index, ranked by score.
+        # Each hop is limited separately so dense nodes can't blow up path enumeration
         cypher = """
-        MATCH (start:Entity)
-        WHERE toLower(start.id) CONTAINS toLower($entity)
-        MATCH path = (start)-[r*1..2]-(connected)
-        UNWIND relationships(path) AS rel
-        RETURN 
+        CALL db.index.fulltext.queryNodes('entity_fts', $entity) YIELD node AS start, score
+        WITH start ORDER BY score DESC LIMIT 5
+        MATCH (start)-[r1]-(n1)
+        WITH r1, n1 LIMIT 50
+        CALL {
+            WITH r1, n1
+            OPTIONAL MATCH (n1)-[r2]-()
+            WHERE r2 <> r1
+            RETURN r2 LIMIT 10
+        }
+        UNWIND [r1, r2] AS rel
+        WITH rel WHERE rel IS NOT NULL
+        RETURN DISTINCT
             startNode(rel).id AS source, 
             type(rel) AS rel_type, 
             endNode(rel).id AS target,
@@ -68,10 +175,18 @@ class GraphRAGChain:
         """
         
         try:
-            result = self.graph.query(cypher, {"entity": entity})
+            lucene_query = " OR ".join(f"({escape_lucene(e)})" for e in entities)
+            result = self.graph.query(cypher, {"entity": lucene_query})
             
             context = []
+            seen = set()
             for record in result:
+                # Skip duplicate edges before doing any formatting work
+                key = (record['source'], record['rel_type'], record['target'])
+                if key in seen:
+                    continue
+                seen.add(key)
+                
                 # Basic Relationship
                 fact = f"{record['source']} {record['rel_type']} {record['target']}"
                 
@@ -85,7 +200,7 @@ class GraphRAGChain:
                 
                 context.append(fact)
             
-            return "\n".join(list(set(context)))
+            return "\n".join(context)
             
         except Exception as e:
             print(f"Graph Error: {e}")
@@ -95,14 +210,8 @@ class GraphRAGChain:
         # 1. Vector Retriever (Increased k to 6 for more info)
         vector_retriever = self.vector_store.as_retriever(search_kwargs={"k": 6})
         
-        def hybrid_retrieval(query):
-            # A. Vector Context
-            vector_docs = vector_retriever.invoke(query)
+        def format_context(vector_docs, graph_context):
             vector_context = "\n".join([d.page_content for d in vector_docs])
-            
-            # B. Graph Context
-            graph_context = self.get_graph_context(query)
-            
             print(f"📄 Graph Context Found (Size: {len(graph_context)} chars)")
             
             return f"""
@@ -112,29 +221,43 @@ class GraphRAGChain:
             --- DATABASE RELATIONSHIPS ---
             {graph_context}
             """
-            
-        # 2. Final Answer Prompt
-        template = """You are a helpful Shopping Assistant for Brandmarkt.
-        Use the provided Information to answer the customer's question.
-        
-        Rules:
-        1. If you find a specific price, mention it clearly.
-        2. If the user asks about a Category (e.g., Bags/Taschen) and you don't see specific items, 
-           list the BRANDS available in that category instead.
-        3. Be polite and professional.
-        4. If info is completely missing, suggest they visit the store in Winterthur.
-        
-        Information:
-        {context}
         
-        Question: {question}
+        def hybrid_retrieval(query):
+            # A. Vector Context
+            vector_docs = vector_retriever.invoke(query)
+            
+            # B. Graph Context
+            graph_context = self.get_graph_context(query)
+            
+            return format_context(vector_docs, graph_context)
         
-        Answer:"""
+        async def ahybrid_retrieval(query):
+            # Vector and graph lookups are independent, so run them concurrently
+            vector_docs, graph_context = await asyncio.gather(
+                vector_retriever.ainvoke(query),
+                self.aget_graph_context(query)
+            )
+            return format_context(vector_docs, graph_context)
+            
+        # 2. Final Answer Prompt
+        template = """You are a polite Shopping Assistant for Brandmarkt. Answer using the Information below.
+State prices clearly when found. For a category with no specific items, list its brands.
+If nothing relevant is found, suggest visiting the store in Winterthur.
+
+Information:
+{context}
+
+Question: {question}
+Answer:"""
         
         prompt = ChatPromptTemplate.from_template(template)
         
         chain = (
-            {"context": hybrid_retrieval, "question": RunnablePassthrough()}
+            {
+                # invoke/stream use the sync path, ainvoke/astream the async one
+                "context": RunnableLambda(hybrid_retrieval, afunc=ahybrid_retrieval),
+                "question": RunnablePassthrough()
+            }
             | prompt
             | self.llm
             | StrOutputParser()
@@ -1,7 +1,6 @@
 from pyvis.network import Network
 import streamlit as st
 import streamlit.components.v1 as components
-import os
 
 def visualize_graph(graph_instance):
     # 1. Initialize PyVis Network
@@ -25,9 +24,12 @@ def visualize_graph(graph_instance):
     # Default color agar koi type match na ho
     default_color = "#97c2fc"
 
-    # 3. Get Data from Neo4j (Limit 100 to avoid crash)
+    # 3. Get Data from Neo4j (Limit 70 to avoid crash)
+    # Best-connected edges first, so the limited view shows the graph's hubs
     query = """
     MATCH (n)-[r]->(m)
+    WITH n, r, m, COUNT { (n)--() } + COUNT { (m)--() } AS degree
+    ORDER BY degree DESC
     RETURN n.id AS source, labels(n) AS source_labels, 
            type(r) AS rel_type, 
            m.id AS target, labels(m) AS target_labels
@@ -41,30 +43,29 @@ def visualize_graph(graph_instance):
         return
 
     # 4. Add Nodes and Edges to PyVis
+    nodes = {}  # id -> (group, color, size), each node styled and added only once
     for record in results:
-        source = record['source']
-        target = record['target']
-        rel_type = record['rel_type']
-        
-        # Determine Source Group & Color
-        s_labels = record['source_labels']
-        s_group = s_labels[0] if s_labels else "Unknown"
-        s_color = color_map.get(s_group, default_color)
-        
-        # Determine Target Group & Color
-        t_labels = record['target_labels']
-        t_group = t_labels[0] if t_labels else "Unknown"
-        t_color = color_map.get(t_group, default_color)
-
-        # Add Nodes (Size bada karein agar wo Brand/Org hai)
-        s_size = 25 if s_group in ["Organization", "Brand"] else 15
-        t_size = 25 if t_group in ["Organization", "Brand"] else 15
+        for node_id, labels in ((record['source'], record['source_labels']),
+                                (record['target'], record['target_labels'])):
+            if node_id in nodes:
+                continue
+            
+            # Determine Group & Color
+            group = labels[0] if labels else "Unknown"
+            color = color_map.get(group, default_color)
+            
+            # Node size bada karein agar wo Brand/Org hai
+            size = 25 if group in ["Organization", "Brand"] else 15
+            
+            nodes[node_id] = (group, color, size)
 
-        net.add_node(source, label=source, title=f"Type: {s_group}", color=s_color, size=s_size)
-        net.add_node(target, label=target, title=f"Type: {t_group}", color=t_color, size=t_size)
-        
-        # Add Edge (Arrow)
-        net.add_edge(source, target, title=rel_type, label=rel_type, color="#d3d3d3")
+    # Add each unique node once (string ids kept as-is)
+    for node_id, (group, color, size) in nodes.items():
+        net.add_node(node_id, label=node_id, title=f"Type: {group}", color=color, size=size)
+    
+    # Add Edges (Arrow)
+    for record in results:
+        net.add_edge(record['source'], record['target'], title=record['rel_type'], label=record['rel_type'], color="#d3d3d3")
 
     # 5. Physics Options (Is se graph thoda smooth move karega)
     net.set_options("""
@@ -94,15 +95,9 @@ def visualize_graph(graph_instance):
     }
     """)
 
-    # 6. Save and Read HTML
+    # 6. Render HTML in memory (no temp file round-trip)
     try:
-        path = "graph_viz.html"
-        net.save_graph(path)
-        
-        # Read file to render in Streamlit
-        with open(path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-            
+        html_content = net.generate_html(notebook=False)
         components.html(html_content, height=600, scrolling=True)
         
     except Exception as e:
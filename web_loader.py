@@ -1,77 +1,238 @@
+import asyncio
+import re
+import sqlite3
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 from langchain_core.documents import Document
-from typing import List, Set
+from typing import Dict, List, Optional, Set, Tuple
 from urllib.parse import urljoin, urlparse
 import time
+from collections import deque
+
+# aiohttp is optional: without it we fall back to the serial requests crawler
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# selectolax's Lexbor (C) parser is preferred; lxml-backed BeautifulSoup is the fallback
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+STRIP_TAGS = ["script", "style", "nav", "footer", "header", "noscript"]
+
+# Whitespace normalisation for clean_text: runs of 2+ spaces split phrases,
+# and any whitespace around a newline collapses into a single newline
+MULTI_SPACE_RE = re.compile(r' {2,}')
+NEWLINE_RE = re.compile(r'\s*\n\s*')
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+class PageCache:
+    """
+    On-disk store of fetched pages and their ETag / Last-Modified validators,
+    so re-crawls can send conditional GETs and reuse the body on a 304.
+    """
+    def __init__(self, path: str = ".http_cache.sqlite"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content BLOB)"
+        )
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        row = self.conn.execute("SELECT etag, last_modified FROM pages WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row:
+            etag, last_modified = row
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def content(self, url: str) -> Optional[bytes]:
+        row = self.conn.execute("SELECT content FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, url: str, headers, content: bytes):
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        # Without a validator the page can't be revalidated, so don't keep it
+        if not (etag or last_modified):
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)", (url, etag, last_modified, content)
+        )
+        self.conn.commit()
 
 class WebLoader:
-    def __init__(self, url: str, max_depth: int = 2, max_pages: int = 20):
+    def __init__(self, url: str, max_depth: int = 2, max_pages: int = 20, concurrency: int = 16,
+                 cache_path: str = ".http_cache.sqlite"):
         self.start_url = url
         self.max_depth = max_depth
         self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.cache = PageCache(cache_path)
+
+        # Shared session: keep-alive sockets are reused across pages of the same host
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(
+            pool_connections=concurrency,
+            pool_maxsize=concurrency,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.visited: Set[str] = set()
         self.base_domain = urlparse(url).netloc
 
     def is_same_domain(self, url: str) -> bool:
         return urlparse(url).netloc == self.base_domain
 
-    def clean_text(self, soup: BeautifulSoup) -> str:
-        # Remove scripts and styles
-        for script in soup(["script", "style", "nav", "footer", "header", "noscript"]):
-            script.decompose()
+    def clean_text(self, text: str) -> str:
+        return NEWLINE_RE.sub('\n', MULTI_SPACE_RE.sub('\n', text)).strip()
+
+    def parse_page(self, url: str, content: bytes) -> Tuple[List[Document], List[str]]:
+        if LexborHTMLParser is not None:
+            tree = LexborHTMLParser(content)
+            title_node = tree.css_first('title')
+            title = title_node.text(strip=True) if title_node else "No Title"
+            # Remove scripts and styles
+            for node in tree.css(','.join(STRIP_TAGS)):
+                node.decompose()
+            text = self.clean_text(tree.body.text(separator='\n') if tree.body else "")
+            hrefs = [a.attributes.get('href') for a in tree.css('a[href]')]
+        else:
+            soup = BeautifulSoup(content, 'lxml')
+            title = soup.title.string if soup.title else "No Title"
+            # Remove scripts and styles
+            for script in soup(STRIP_TAGS):
+                script.decompose()
+            text = self.clean_text(soup.get_text())
+            hrefs = [a_tag['href'] for a_tag in soup.find_all('a', href=True)]
+        
+        docs = [Document(page_content=text, metadata={"source": url, "title": title})]
+        
+        # Find all links
+        links = []
+        for href in hrefs:
+            if not href:
+                continue
+            full_url = urljoin(url, href)
+            # Remove fragment
+            full_url = full_url.split('#')[0]
+            
+            if self.is_same_domain(full_url) and full_url not in self.visited:
+                links.append(full_url)
         
-        text = soup.get_text()
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        return '\n'.join(chunk for chunk in chunks if chunk)
+        return docs, links
 
-    def scrape_page(self, url: str) -> List[Document]:
+    def scrape_page(self, url: str) -> Tuple[List[Document], List[str]]:
         if url in self.visited or len(self.visited) >= self.max_pages:
-            return []
+            return [], []
         
         print(f"Scraping: {url}")
         self.visited.add(url)
         
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=self.cache.conditional_headers(url), timeout=10)
+            # 304: page unchanged since last crawl, reuse the stored body
+            if response.status_code == 304:
+                content = self.cache.content(url)
+                if content is not None:
+                    return self.parse_page(url, content)
+                # No stored body (row gone or unsolicited 304): re-fetch unconditionally
+                response = self.session.get(url, timeout=10)
+                if response.status_code == 304:
+                    raise ValueError("304 Not Modified without a cached body")
             response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            text = self.clean_text(soup)
-            title = soup.title.string if soup.title else "No Title"
-            
-            docs = [Document(page_content=text, metadata={"source": url, "title": title})]
-            
-            # Find all links
-            links = []
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
-                full_url = urljoin(url, href)
-                # Remove fragment
-                full_url = full_url.split('#')[0]
-                
-                if self.is_same_domain(full_url) and full_url not in self.visited:
-                    links.append(full_url)
-            
-            return docs, links
+            self.cache.put(url, response.headers, response.content)
+            return self.parse_page(url, response.content)
             
         except Exception as e:
             print(f"Error scraping {url}: {e}")
             return [], []
 
+    async def _scrape_async(self, session, semaphore: asyncio.Semaphore, url: str) -> Tuple[List[Document], List[str]]:
+        async with semaphore:
+            print(f"Scraping: {url}")
+            try:
+                content = None
+                retried_429 = False
+                conditional = True
+                while content is None:
+                    headers = self.cache.conditional_headers(url) if conditional else {}
+                    delay = 0
+                    async with session.get(url, headers=headers) as response:
+                        # Only back off when the server actually asks us to
+                        if response.status == 429 and not retried_429:
+                            retried_429 = True
+                            retry_after = response.headers.get("Retry-After", "1")
+                            delay = float(retry_after) if retry_after.isdigit() else 1
+                        elif response.status == 304:
+                            content = self.cache.content(url)
+                            if content is None:
+                                if not conditional:
+                                    raise ValueError("304 Not Modified without a cached body")
+                                # No stored body (row gone or unsolicited 304): re-fetch unconditionally
+                                conditional = False
+                        else:
+                            response.raise_for_status()
+                            content = await response.read()
+                            self.cache.put(url, response.headers, content)
+                    if delay:
+                        await asyncio.sleep(delay)
+                # Parse inside the try so one bad page can't abort the whole gather()
+                return self.parse_page(url, content)
+            except Exception as e:
+                print(f"Error scraping {url}: {e}")
+                return [], []
+
+    async def _load_async(self) -> List[Document]:
+        all_docs = []
+        layer = [self.start_url]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=10)
+        
+        async with aiohttp.ClientSession(connector=connector, headers=HEADERS, timeout=timeout) as session:
+            # One depth level at a time, every page in the level fetched concurrently
+            for _ in range(self.max_depth + 1):
+                remaining = self.max_pages - len(self.visited)
+                layer = [u for u in dict.fromkeys(layer) if u not in self.visited][:remaining]
+                if not layer:
+                    break
+                self.visited.update(layer)
+                
+                results = await asyncio.gather(
+                    *[self._scrape_async(session, semaphore, u) for u in layer]
+                )
+                layer = []
+                for page_docs, new_links in results:
+                    all_docs.extend(page_docs)
+                    layer.extend(new_links)
+        
+        return all_docs
+
     def load(self) -> List[Document]:
         """
         Recursively fetches content starting from the base URL.
         """
+        if aiohttp is not None:
+            return asyncio.run(self._load_async())
+        
         all_docs = []
-        queue = [(self.start_url, 0)] # (url, depth)
+        queue = deque([(self.start_url, 0)]) # (url, depth)
         
         while queue and len(self.visited) < self.max_pages:
-            current_url, current_depth = queue.pop(0)
+            current_url, current_depth = queue.popleft()
             
             if current_depth > self.max_depth:
                 continue